@@ -10,9 +10,49 @@ from dataclasses import dataclass
 from enum import Enum
 import hashlib
 import os
+import sys
+from bisect import bisect_right
+
+try:
+    import numpy as np
+except ImportError:  # optional speedup, luhn_check_many checks one number at a time without it
+    np = None
 
 logger = logging.getLogger(__name__)
 
+# Luhn digit values indexed by ASCII byte, usable as bytes.translate tables
+_DIGIT = bytes(b - 48 if 48 <= b <= 57 else 0 for b in range(256))
+_DOUBLED = bytes((2 * (b - 48) - 9 if b >= 53 else 2 * (b - 48)) if 48 <= b <= 57 else 0 for b in range(256))
+
+if np is not None:
+    _DIGIT_NP = np.frombuffer(_DIGIT, dtype=np.uint8)
+    _DOUBLED_NP = np.frombuffer(_DOUBLED, dtype=np.uint8)
+
+# Every card pattern match contains a run of at least 13 digits, so lines
+# are screened for one before the per-brand patterns run
+_PAN_SHAPE = re.compile(r'\d{13}')
+_NON_DIGIT = re.compile(r'\D')
+
+# privacy.pan_hash_algorithm choices; both give 64 hex characters
+_PAN_HASHERS = {
+    'sha256': hashlib.sha256,
+    'blake2b-256': lambda: hashlib.blake2b(digest_size=32),
+}
+
+def make_pan_hasher(config: dict):
+    """
+    Return a fresh hash object for privacy.pan_hash_algorithm. Callers keep
+    it and copy() it per PAN instead of constructing a new one each time.
+    """
+    hash_algorithm = config.get('privacy', {}).get('pan_hash_algorithm', 'sha256')
+    if hash_algorithm not in _PAN_HASHERS:
+        logger.warning(f"Unknown pan_hash_algorithm '{hash_algorithm}', using sha256")
+        hash_algorithm = 'sha256'
+    return _PAN_HASHERS[hash_algorithm]()
+
+# Same-length groups smaller than this are cheaper to check one by one
+_BATCH_LUHN_MIN = 64
+
 class CardType(Enum):
     VISA = "visa"
     MASTERCARD = "mastercard"
@@ -25,6 +65,11 @@ class CardType(Enum):
 @dataclass
 class PANMatch:
     """Represents a potential PAN match in a file"""
+    # Scans can produce many matches; slots drop the per-instance dict
+    __slots__ = ('file_path', 'line_number', 'column_start', 'column_end', 'raw_match',
+                 'masked_match', 'card_type', 'luhn_valid', 'confidence_score',
+                 'context_before', 'context_after', 'is_masked')
+    
     file_path: str
     line_number: int
     column_start: int
@@ -51,6 +96,24 @@ class PANDetector:
         CardType.JCB: r'(?:2131|1800|35\d{3})\d{11}'
     }
     
+    # CARD_PATTERNS as 6-digit BIN ranges and the lengths each accepts,
+    # sorted by range start; ranges do not overlap
+    BIN_RANGES = [
+        (180000, 180099, CardType.JCB, (15,)),
+        (213100, 213199, CardType.JCB, (15,)),
+        (222100, 272099, CardType.MASTERCARD, (16,)),
+        (300000, 305999, CardType.DINERS, (14,)),
+        (340000, 349999, CardType.AMEX, (15,)),
+        (350000, 359999, CardType.JCB, (16,)),
+        (360000, 369999, CardType.DINERS, (14,)),
+        (370000, 379999, CardType.AMEX, (15,)),
+        (380000, 389999, CardType.DINERS, (14,)),
+        (400000, 499999, CardType.VISA, (13, 16)),
+        (510000, 559999, CardType.MASTERCARD, range(16, sys.maxsize)),  # Pattern is not end-anchored
+        (601100, 601199, CardType.DISCOVER, (16,)),
+        (650000, 659999, CardType.DISCOVER, (16,)),
+    ]
+    
     # Patterns that indicate masked/redacted numbers
     MASKED_PATTERNS = [
         r'\*{4,}',          # ****1234
@@ -70,6 +133,13 @@ class PANDetector:
         self.min_confidence = config.get('detection', {}).get('minimum_confidence_score', 0.7)
         self.context_window = config.get('detection', {}).get('context_window_chars', 100)
         self.exclude_masked = config.get('detection', {}).get('exclude_masked_patterns', True)
+        self.show_last4 = config.get('privacy', {}).get('show_last4_only', True)
+        self.allow_full_pan_retention = config.get('privacy', {}).get('allow_full_pan_retention', False)
+        self.max_file_size = config.get('agent', {}).get('max_file_size_mb', 10) * 1024 * 1024
+        self.scan_extensions = frozenset(config.get('agent', {}).get('file_extensions_to_scan', []))
+        
+        # Seeded once; hash_pan copies it instead of constructing a new hash object
+        self._pan_hasher = make_pan_hasher(config)
         
         # Compile regex patterns for performance
         self._compile_patterns()
@@ -83,6 +153,7 @@ class PANDetector:
             self.compiled_patterns[card_type] = re.compile(r'\b' + pattern + r'\b')
         
         self.masked_regex = [re.compile(pattern) for pattern in self.MASKED_PATTERNS]
+        self._bin_starts = [bin_range[0] for bin_range in self.BIN_RANGES]
         logger.debug(f"Compiled {len(self.compiled_patterns)} card patterns and {len(self.masked_regex)} mask patterns")
     
     def luhn_check(self, card_number: str) -> bool:
@@ -90,29 +161,59 @@ class PANDetector:
         Validate card number using Luhn algorithm
         Returns True if valid, False otherwise
         """
-        # Remove any non-digit characters
-        digits = [int(d) for d in card_number if d.isdigit()]
+        if not (card_number.isascii() and card_number.isdigit()):
+            # Remove any non-digit characters
+            card_number = ''.join(d for d in card_number if d.isdigit())
+            if not card_number.isascii():
+                card_number = ''.join(str(int(d)) for d in card_number)
         
-        if len(digits) < 13 or len(digits) > 19:
+        if len(card_number) < 13 or len(card_number) > 19:
             return False
         
-        checksum = 0
+        # Doubled and plain digits are summed as two translated byte strings,
+        # keeping the per-digit work in C
+        digits = card_number.encode('ascii')
         parity = len(digits) % 2
-        
-        for i, digit in enumerate(digits):
-            if i % 2 == parity:
-                digit *= 2
-                if digit > 9:
-                    digit -= 9
-            checksum += digit
-        
+        checksum = sum(digits[parity::2].translate(_DOUBLED)) + sum(digits[1 - parity::2].translate(_DIGIT))
         return checksum % 10 == 0
     
+    def luhn_check_many(self, card_numbers: List[str]) -> List[bool]:
+        """
+        Luhn-validate several digit strings at once. With NumPy installed,
+        large groups of equal-length numbers are checked as one 2-D array.
+        """
+        results = [False] * len(card_numbers)
+        groups: Dict[int, List[int]] = {}
+        for i, card_number in enumerate(card_numbers):
+            if np is not None and card_number.isascii() and card_number.isdigit():
+                groups.setdefault(len(card_number), []).append(i)
+            else:
+                results[i] = self.luhn_check(card_number)
+        
+        for length, positions in groups.items():
+            if len(positions) < _BATCH_LUHN_MIN or not 13 <= length <= 19:
+                for i in positions:
+                    results[i] = self.luhn_check(card_numbers[i])
+                continue
+            digits = np.frombuffer(
+                ''.join([card_numbers[i] for i in positions]).encode('ascii'), dtype=np.uint8
+            ).reshape(-1, length)
+            parity = length % 2
+            checksum = _DOUBLED_NP[digits[:, parity::2]].sum(axis=1) + _DIGIT_NP[digits[:, 1 - parity::2]].sum(axis=1)
+            for i, valid in zip(positions, (checksum % 10 == 0).tolist()):
+                results[i] = valid
+        return results
+    
     def is_masked_number(self, text: str) -> bool:
         """Check if the text appears to be a masked card number"""
         if not self.exclude_masked:
             return False
             
+        # Every mask pattern needs one of these characters; substring tests
+        # rule most text out without running the regexes
+        if '*' not in text and 'X' not in text and '#' not in text:
+            return False
+        
         for regex in self.masked_regex:
             if regex.search(text):
                 return True
@@ -131,8 +232,10 @@ class PANDetector:
             return "*" * len(pan)
     
     def hash_pan(self, pan: str) -> str:
-        """Create SHA256 hash of PAN for secure storage"""
-        return hashlib.sha256(pan.encode()).hexdigest()
+        """Create SHA256 (or configured BLAKE2b-256) hash of PAN for secure storage"""
+        hasher = self._pan_hasher.copy()
+        hasher.update(pan.encode())
+        return hasher.hexdigest()
     
     def calculate_confidence(self, match: str, card_type: CardType, luhn_valid: bool, 
                            context: str, is_masked: bool) -> float:
@@ -171,7 +274,17 @@ class PANDetector:
     
     def detect_card_type(self, pan: str) -> CardType:
         """Determine card type based on number pattern"""
-        digits_only = re.sub(r'\D', '', pan)
+        digits_only = pan if pan.isdecimal() else _NON_DIGIT.sub('', pan)
+        
+        if digits_only.isascii() and len(digits_only) >= 13:
+            # Look the BIN up instead of trying each pattern in turn
+            bin6 = int(digits_only[:6])
+            i = bisect_right(self._bin_starts, bin6) - 1
+            if i >= 0:
+                _, high, card_type, lengths = self.BIN_RANGES[i]
+                if bin6 <= high and len(digits_only) in lengths:
+                    return card_type
+            return CardType.UNKNOWN
         
         for card_type, pattern in self.compiled_patterns.items():
             if pattern.match(digits_only):
@@ -179,81 +292,97 @@ class PANDetector:
         
         return CardType.UNKNOWN
     
-    def scan_text(self, text: str, file_path: str) -> List[PANMatch]:
+    def scan_text(self, text: str, file_path: str, line_offset: int = 0) -> List[PANMatch]:
         """
-        Scan text content for potential PANs
+        Scan text content for potential PANs; line_offset is the number of
+        lines that precede text in the file when it is scanned in pieces
         Returns list of PANMatch objects
         """
         matches = []
+        # Luhn results by digit string; logs often repeat the same number
+        luhn_seen: Dict[str, bool] = {}
+        if not _PAN_SHAPE.search(text):
+            return matches
         lines = text.split('\n')
         
-        for line_num, line in enumerate(lines, 1):
+        for line_num, line in enumerate(lines, line_offset + 1):
+            if not _PAN_SHAPE.search(line):
+                continue
+            
             # Skip lines that appear to contain only masked numbers
             if self.is_masked_number(line):
                 logger.debug(f"Skipping masked line at {file_path}:{line_num}")
                 continue
             
-            # Check each card type pattern
+            # Collect every card type's candidates, then Luhn-check them together
+            candidates = []
             for card_type, pattern in self.compiled_patterns.items():
                 for match in pattern.finditer(line):
-                    pan_candidate = match.group()
-                    digits_only = re.sub(r'\D', '', pan_candidate)
+                    # Card patterns only match digits, so there is nothing to strip
+                    digits_only = match.group()
                     
                     # Skip if too short or too long
                     if len(digits_only) < 13 or len(digits_only) > 19:
                         continue
-                    
-                    # Luhn validation
-                    luhn_valid = self.luhn_check(digits_only)
-                    
-                    # Skip if Luhn validation required but failed
-                    if self.require_luhn and not luhn_valid:
-                        continue
-                    
-                    # Extract context
-                    start_pos = max(0, match.start() - self.context_window)
-                    end_pos = min(len(line), match.end() + self.context_window)
-                    
-                    context_before = line[start_pos:match.start()]
-                    context_after = line[match.end():end_pos]
-                    full_context = context_before + pan_candidate + context_after
-                    
-                    # Check if this specific match appears masked
-                    is_masked = self.is_masked_number(full_context)
-                    
-                    # Calculate confidence score
-                    confidence = self.calculate_confidence(
-                        pan_candidate, card_type, luhn_valid, full_context, is_masked
-                    )
-                    
-                    # Skip low confidence matches
-                    if confidence < self.min_confidence:
-                        continue
-                    
-                    # Create masked version for safe storage
-                    show_last4 = self.config.get('privacy', {}).get('show_last4_only', True)
-                    masked_pan = self.mask_pan(digits_only, show_last4)
-                    
-                    pan_match = PANMatch(
-                        file_path=file_path,
-                        line_number=line_num,
-                        column_start=match.start(),
-                        column_end=match.end(),
-                        raw_match=pan_candidate if self.config.get('privacy', {}).get('allow_full_pan_retention', False) else "",
-                        masked_match=masked_pan,
-                        card_type=card_type,
-                        luhn_valid=luhn_valid,
-                        confidence_score=confidence,
-                        context_before=context_before[-50:] if len(context_before) > 50 else context_before,
-                        context_after=context_after[:50] if len(context_after) > 50 else context_after,
-                        is_masked=is_masked
-                    )
-                    
-                    matches.append(pan_match)
-                    
-                    logger.debug(f"Found PAN candidate: {file_path}:{line_num} "
-                               f"Type: {card_type.value} Luhn: {luhn_valid} "
-                               f"Confidence: {confidence:.2f}")
+                    candidates.append((card_type, match, digits_only))
+            if not candidates:
+                continue
+            
+            unchecked = [digits_only for _, _, digits_only in candidates if digits_only not in luhn_seen]
+            if unchecked:
+                luhn_seen.update(zip(unchecked, self.luhn_check_many(unchecked)))
+            for card_type, match, digits_only in candidates:
+                luhn_valid = luhn_seen[digits_only]
+                pan_candidate = match.group()
+                
+                # Skip if Luhn validation required but failed
+                if self.require_luhn and not luhn_valid:
+                    continue
+                
+                # Extract context
+                start_pos = max(0, match.start() - self.context_window)
+                end_pos = min(len(line), match.end() + self.context_window)
+                
+                context_before = line[start_pos:match.start()]
+                context_after = line[match.end():end_pos]
+                full_context = context_before + pan_candidate + context_after
+                
+                # The mask patterns are unanchored, so a context cut from a line
+                # that passed the masked-line check above cannot match one
+                is_masked = False
+                
+                # Calculate confidence score
+                confidence = self.calculate_confidence(
+                    pan_candidate, card_type, luhn_valid, full_context, is_masked
+                )
+                
+                # Skip low confidence matches
+                if confidence < self.min_confidence:
+                    continue
+                
+                # Create masked version for safe storage
+                masked_pan = self.mask_pan(digits_only, self.show_last4)
+                
+                pan_match = PANMatch(
+                    file_path=file_path,
+                    line_number=line_num,
+                    column_start=match.start(),
+                    column_end=match.end(),
+                    raw_match=pan_candidate if self.allow_full_pan_retention else "",
+                    masked_match=masked_pan,
+                    card_type=card_type,
+                    luhn_valid=luhn_valid,
+                    confidence_score=confidence,
+                    context_before=context_before[-50:] if len(context_before) > 50 else context_before,
+                    context_after=context_after[:50] if len(context_after) > 50 else context_after,
+                    is_masked=is_masked
+                )
+                
+                matches.append(pan_match)
+                
+                logger.debug(f"Found PAN candidate: {file_path}:{line_num} "
+                           f"Type: {card_type.value} Luhn: {luhn_valid} "
+                           f"Confidence: {confidence:.2f}")
         
         return matches
     
@@ -263,16 +392,14 @@ class PANDetector:
         """
         try:
             # Check file size
-            max_size = self.config.get('agent', {}).get('max_file_size_mb', 10) * 1024 * 1024
-            if os.path.getsize(file_path) > max_size:
+            if os.path.getsize(file_path) > self.max_file_size:
                 logger.debug(f"Skipping {file_path}: exceeds size limit")
                 return False
             
             # Check file extension
-            scan_extensions = self.config.get('agent', {}).get('file_extensions_to_scan', [])
-            if scan_extensions:
+            if self.scan_extensions:
                 file_ext = os.path.splitext(file_path)[1].lower()
-                if file_ext not in scan_extensions:
+                if file_ext not in self.scan_extensions:
                     logger.debug(f"Skipping {file_path}: extension {file_ext} not in scan list")
                     return False
             
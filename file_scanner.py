@@ -6,10 +6,11 @@ Handles file system traversal and content scanning
 import os
 import logging
 import mimetypes
+import multiprocessing
 import chardet
 from pathlib import Path
-from typing import List, Generator, Optional, Set
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Generator, Iterator, Optional, Set
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import fnmatch
 import magic
 from tqdm import tqdm
@@ -18,6 +19,33 @@ from detection_engine import PANDetector, PANMatch
 
 logger = logging.getLogger(__name__)
 
+# Files are read and scanned this many characters (rounded up to whole
+# lines) at a time, so peak memory no longer grows with file size
+_READ_BATCH_CHARS = 1 << 20
+
+# Per-process scanner and shared stop flag used when agent.use_process_pool is set
+_worker_scanner = None
+_worker_stop = None
+
+def _init_worker(config: dict, stop_event):
+    """Build the detector and scanner once in each pool process"""
+    global _worker_scanner, _worker_stop
+    _worker_scanner = FileScanner(config, PANDetector(config))
+    _worker_stop = stop_event
+
+def _scan_file_in_worker(file_path: str) -> tuple:
+    """
+    Scan one file in a pool process. Returns the matches and the change in
+    the worker's stats so the parent scanner can add it to its own.
+    """
+    # Files already handed to this process still arrive after a stop
+    if _worker_stop.is_set():
+        return [], {}
+    before = _worker_scanner.get_stats()
+    matches = _worker_scanner.scan_file(file_path)
+    stats = _worker_scanner.stats
+    return matches, {key: stats[key] - before[key] for key in stats}
+
 class FileScanner:
     """Handles secure file system scanning with configurable exclusions"""
     
@@ -31,6 +59,9 @@ class FileScanner:
         self.max_depth = self.agent_config.get('max_recursion_depth', 8)
         self.concurrency = self.agent_config.get('concurrency', 4)
         self.batch_size = self.agent_config.get('batch_size', 1000)
+        # Processes sidestep the GIL for CPU-bound pattern matching
+        self.use_process_pool = self.agent_config.get('use_process_pool', False)
+        self._worker_stop = None
         
         # Unlimited if set to 0
         if self.max_files == 0:
@@ -155,6 +186,16 @@ class FileScanner:
         Safely read file content with encoding detection
         Returns None if file cannot be read as text
         """
+        content = ''.join(''.join(lines) for lines in self.read_file_batches(file_path))
+        return content or None
+    
+    def read_file_batches(self, file_path: str) -> Iterator[List[str]]:
+        """
+        Read file content with encoding detection as batches of whole lines,
+        each roughly _READ_BATCH_CHARS long. Yields nothing if the file
+        cannot be read as text; a read error after the first batch ends
+        the file there rather than retrying another encoding.
+        """
         try:
             mime_type, encoding = self.detect_file_type(file_path)
             
@@ -166,7 +207,7 @@ class FileScanner:
                     'application/sql', 'application/yaml'
                 ]
                 if mime_type not in text_like_apps:
-                    return None
+                    return
             
             # Attempt to read with detected encoding
             encodings_to_try = [encoding, 'utf-8', 'latin1', 'cp1252']
@@ -174,10 +215,21 @@ class FileScanner:
             for enc in encodings_to_try:
                 try:
                     with open(file_path, 'r', encoding=enc, errors='ignore') as f:
-                        content = f.read()
-                        if content:  # Successfully read non-empty content
-                            logger.debug(f"Read {file_path} with encoding {enc}")
-                            return content
+                        lines = f.readlines(_READ_BATCH_CHARS)
+                        if not lines:
+                            continue
+                        logger.debug(f"Reading {file_path} with encoding {enc}")
+                        while lines:  # Successfully read non-empty content
+                            yield lines
+                            try:
+                                lines = f.readlines(_READ_BATCH_CHARS)
+                            except Exception as e:
+                                # Earlier batches were already scanned; falling back to
+                                # another encoding would read them again
+                                logger.warning(f"Error reading file {file_path}: {e}")
+                                self.stats['errors'] += 1
+                                return
+                        return
                 except UnicodeDecodeError:
                     continue
                 except Exception as e:
@@ -185,12 +237,10 @@ class FileScanner:
                     continue
             
             logger.debug(f"Could not read {file_path} with any encoding")
-            return None
             
         except Exception as e:
             logger.warning(f"Error reading file {file_path}: {e}")
             self.stats['errors'] += 1
-            return None
     
     def scan_file(self, file_path: str) -> List[PANMatch]:
         """
@@ -202,13 +252,15 @@ class FileScanner:
                 self.stats['files_skipped'] += 1
                 return []
             
-            content = self.read_file_content(file_path)
-            if content is None:
+            matches = []
+            lines_read = 0
+            for lines in self.read_file_batches(file_path):
+                matches.extend(self.detector.scan_text(''.join(lines), file_path, lines_read))
+                lines_read += len(lines)
+            if not lines_read:
                 self.stats['files_skipped'] += 1
                 return []
             
-            matches = self.detector.scan_text(content, file_path)
-            
             self.stats['files_scanned'] += 1
             self.stats['matches_found'] += len(matches)
             
@@ -275,6 +327,8 @@ class FileScanner:
         """Request the scan to stop gracefully"""
         logger.info("Stop requested - scan will terminate after current files complete")
         self.stop_requested = True
+        if self._worker_stop is not None:
+            self._worker_stop.set()
     
     def scan_directories(self, directories: List[str], progress_callback=None) -> List[PANMatch]:
         """
@@ -346,8 +400,21 @@ class FileScanner:
         all_matches = []
         files_completed = 0
         
-        # Scan files using thread pool with accurate progress
-        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+        # Scan files using thread (or process) pool with accurate progress
+        if self.use_process_pool:
+            # Remote scans run alongside the socket.io and heartbeat threads,
+            # and forking a multi-threaded process can deadlock
+            mp_context = multiprocessing.get_context('spawn')
+            self._worker_stop = mp_context.Event()
+            executor = ProcessPoolExecutor(max_workers=self.concurrency, mp_context=mp_context,
+                                           initializer=_init_worker,
+                                           initargs=(self.config, self._worker_stop))
+            scan = _scan_file_in_worker
+        else:
+            executor = ThreadPoolExecutor(max_workers=self.concurrency)
+            scan = self.scan_file
+        
+        with executor:
             futures = {}
             file_index = 0
             
@@ -356,7 +423,7 @@ class FileScanner:
             for i in range(initial_batch_size):
                 if file_index < total_files:
                     file_path = all_files[file_index]
-                    future = executor.submit(self.scan_file, file_path)
+                    future = executor.submit(scan, file_path)
                     futures[future] = file_path
                     file_index += 1
             
@@ -374,7 +441,13 @@ class FileScanner:
                     file_path = futures.pop(future)
                     
                     try:
-                        matches = future.result()
+                        result = future.result()
+                        if self.use_process_pool:
+                            matches, stats_delta = result
+                            for key, value in stats_delta.items():
+                                self.stats[key] += value
+                        else:
+                            matches = result
                         if matches:
                             all_matches.extend(matches)
                         
@@ -406,7 +479,7 @@ class FileScanner:
                     # Submit new file to replace completed one (keep pipeline full)
                     if file_index < total_files and not self.stop_requested:
                         next_file = all_files[file_index]
-                        new_future = executor.submit(self.scan_file, next_file)
+                        new_future = executor.submit(scan, next_file)
                         futures[new_future] = next_file
                         file_index += 1
                     
@@ -4,11 +4,17 @@ Coordinates scanning, reporting, and audit logging
 """
 
 import os
+import stat
 import sys
+import mmap
+import multiprocessing
+import asyncio
+import threading
 import logging
 import yaml
 import json
 import argparse
+import platform
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Optional
@@ -27,6 +33,13 @@ SCRIPT_DIR = Path(__file__).parent.resolve()
 LOGS_DIR = SCRIPT_DIR / 'logs'
 LOGS_DIR.mkdir(exist_ok=True)
 
+# Prefer the libyaml-backed safe loader when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Host platform, resolved once at import
+_SYSTEM = platform.system()
+_IS_WINDOWS = _SYSTEM == 'Windows'
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -73,8 +86,13 @@ class PCIComplianceAgent:
         self.current_scan_id = None
         self.current_operator = None
         self.current_directories = None  # Store directories for current scan
-        self.current_scan_thread = None
+        self.current_scan_future = None
         self.scan_running = False
+        self.last_scan_stats = {}  # Scanner stats snapshot from the last run_scan
+        
+        # Event loop that dispatches remote scans (started on first use)
+        self._scan_loop = None
+        self._scan_stop_event = None
         
         logger.info(f"PCI Compliance Agent initialized (ID: {self.agent_id})")
     
@@ -91,8 +109,13 @@ class PCIComplianceAgent:
                 else:
                     raise FileNotFoundError(f"No config file found at {self.config_path}")
             
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
+            # Parse straight from a read-only mapping of the file
+            with open(config_file, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    config = None  # mmap cannot map an empty file
+                else:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        config = yaml.load(mm, Loader=_YAML_LOADER)
             
             logger.info(f"Configuration loaded from {config_file.name}")
             return config
@@ -104,9 +127,8 @@ class PCIComplianceAgent:
     def _generate_agent_id(self) -> str:
         """Generate unique agent identifier"""
         # Use machine-specific info for consistent agent ID
-        import platform
-        machine_info = f"{platform.node()}-{platform.system()}-{platform.machine()}"
-        agent_id = hashlib.sha256(machine_info.encode()).hexdigest()[:16]
+        machine_info = f"{platform.node()}-{_SYSTEM}-{platform.machine()}"
+        agent_id = hashlib.blake2b(machine_info.encode(), digest_size=8).hexdigest()
         return f"pci-agent-{agent_id}"
     
     def _validate_configuration(self) -> bool:
@@ -155,7 +177,7 @@ class PCIComplianceAgent:
         if not directories:
             directories = self.config.get('agent', {}).get('scan_directories', [])
         
-        logger.info(f"Requested scan directories: {directories}")
+        logger.info("Requested scan directories: %s", directories)
         
         # Check for whole-system scan marker
         if directories and directories[0] == '*':
@@ -166,17 +188,20 @@ class PCIComplianceAgent:
             valid_directories = []
             for directory in directories:
                 dir_path = os.path.abspath(directory)
-                if os.path.exists(dir_path):
-                    if os.path.isdir(dir_path):
-                        if os.access(dir_path, os.R_OK):
-                            valid_directories.append(dir_path)
-                            logger.info(f"✓ Directory validated: {dir_path}")
-                        else:
-                            logger.warning(f"Directory exists but not readable: {dir_path}")
-                    else:
-                        logger.warning(f"Path exists but is not a directory: {dir_path}")
-                else:
-                    logger.warning(f"Directory does not exist: {dir_path}")
+                # One stat call covers both the existence and directory checks
+                try:
+                    st = os.stat(dir_path)
+                except OSError:
+                    logger.warning("Directory does not exist: %s", dir_path)
+                    continue
+                if not stat.S_ISDIR(st.st_mode):
+                    logger.warning("Path exists but is not a directory: %s", dir_path)
+                    continue
+                if not os.access(dir_path, os.R_OK):
+                    logger.warning("Directory exists but not readable: %s", dir_path)
+                    continue
+                valid_directories.append(dir_path)
+                logger.info("✓ Directory validated: %s", dir_path)
         
         if not valid_directories:
             error_msg = f"No valid directories to scan. Requested: {directories}"
@@ -194,33 +219,31 @@ class PCIComplianceAgent:
             config_hash=self._get_config_hash()
         )
         
-        logger.info(f"Started scan session {self.current_scan_id} by {operator}")
-        logger.info(f"Scanning directories: {valid_directories}")
+        logger.info("Started scan session %s by %s", self.current_scan_id, operator)
+        logger.info("Scanning directories: %s", valid_directories)
         
         return self.current_scan_id
     
     def _discover_system_directories(self) -> List[str]:
         """Discover all accessible directories on the system for whole-system scan"""
-        import platform
-        system = platform.system()
         directories = []
         
         try:
-            if system == 'Windows':
+            if _IS_WINDOWS:
                 # Discover Windows drives and common directories
                 import string
                 for drive in string.ascii_uppercase:
                     drive_path = f"{drive}:\\"
                     if os.path.exists(drive_path):
                         directories.append(drive_path)
-                        logger.info(f"Discovered drive: {drive_path}")
+                        logger.info("Discovered drive: %s", drive_path)
                         
                         # Add common Windows directories
                         for subdir in ['Users', 'ProgramData', 'Program Files', 'inetpub', 'Windows\\Temp']:
                             full_path = os.path.join(drive_path, subdir)
                             if os.path.exists(full_path) and os.access(full_path, os.R_OK):
                                 directories.append(full_path)
-                                logger.info(f"Discovered directory: {full_path}")
+                                logger.info("Discovered directory: %s", full_path)
             else:
                 # Linux/Unix - discover major directories
                 root_dirs = ['/', '/home', '/root', '/var', '/var/www', '/opt', '/tmp', 
@@ -228,9 +251,9 @@ class PCIComplianceAgent:
                 for dir_path in root_dirs:
                     if os.path.exists(dir_path) and os.access(dir_path, os.R_OK):
                         directories.append(dir_path)
-                        logger.info(f"Discovered directory: {dir_path}")
+                        logger.info("Discovered directory: %s", dir_path)
         except Exception as e:
-            logger.error(f"Error discovering system directories: {e}")
+            logger.error("Error discovering system directories: %s", e)
             # Fallback to config directories
             directories = self.config.get('agent', {}).get('scan_directories', [])
         
@@ -238,28 +261,28 @@ class PCIComplianceAgent:
     
     def run_scan(self, progress_callback=None) -> List[PANMatch]:
         """Execute the PAN detection scan"""
-        if not self.current_scan_id:
+        # start_scan_session always sets both, or raises
+        if not self.current_scan_id or not self.current_directories:
             raise ValueError("No active scan session - call start_scan_session first")
         
         logger.info(f"Starting PAN detection scan (Session: {self.current_scan_id})")
         
-        # Use directories from the current scan session, or fall back to config
-        directories = self.current_directories or self.config.get('agent', {}).get('scan_directories', [])
-        
         try:
             # Reset scanner statistics
             self.scanner.reset_stats()
             
             # Run the scan
-            matches = self.scanner.scan_directories(directories, progress_callback)
+            matches = self.scanner.scan_directories(self.current_directories, progress_callback)
+            
+            # Snapshot stats once; reporting and the CLI summary reuse it
+            self.last_scan_stats = self.scanner.get_stats()
             
             # Log scan completion
-            scan_stats = self.scanner.get_stats()
             self.audit_logger.log_scan_complete(
                 scan_id=self.current_scan_id,
                 matches_found=len(matches),
-                files_scanned=scan_stats['files_scanned'],
-                errors=scan_stats['errors']
+                files_scanned=self.last_scan_stats['files_scanned'],
+                errors=self.last_scan_stats['errors']
             )
             
             logger.info(f"Scan completed: {len(matches)} potential PANs found")
@@ -272,7 +295,7 @@ class PCIComplianceAgent:
     
     def generate_report(self, matches: List[PANMatch]) -> dict:
         """Generate security report from scan results"""
-        if not self.current_scan_id:
+        if not self.current_scan_id or not self.current_directories:
             raise ValueError("No active scan session")
         
         report = self.report_generator.create_report(
@@ -280,14 +303,12 @@ class PCIComplianceAgent:
             scan_id=self.current_scan_id,
             operator=self.current_operator,
             matches=matches,
-            scan_stats=self.scanner.get_stats(),
+            scan_stats=self.last_scan_stats,
             config_summary=self._get_config_summary()
         )
         
         # Add actual directories that were scanned for server compatibility
-        # Use the directories from the current scan session, not the config
-        directories = self.current_directories or self.config.get('agent', {}).get('scan_directories', [])
-        report['actual_directories'] = directories
+        report['actual_directories'] = self.current_directories
         
         logger.info(f"Generated report with {len(matches)} findings")
         return report
@@ -311,19 +332,30 @@ class PCIComplianceAgent:
             logger.error(f"Error sending report: {e}")
             return False
     
-    def save_report_locally(self, report: dict, file_path: str = None) -> str:
-        """Save report to local file"""
+    def save_report_locally(self, report: dict, file_path: str = None,
+                            output_format: str = 'json',
+                            matches: Optional[List[PANMatch]] = None) -> str:
+        """
+        Save report to local file as JSON, or save its matches as CSV
+        through ReportGenerator.export_csv
+        """
         if not file_path:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             reports_dir = SCRIPT_DIR / 'reports'
-            reports_dir.mkdir(exist_ok=True)
-            file_path = reports_dir / f"pci_scan_report_{self.current_scan_id}_{timestamp}.json"
+            file_path = reports_dir / f"pci_scan_report_{self.current_scan_id}_{timestamp}.{output_format}"
         
         # Ensure reports directory exists
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, default=str)
+        report_dir = os.path.dirname(file_path)
+        if report_dir:
+            os.makedirs(report_dir, exist_ok=True)
+        
+        if output_format == 'csv':
+            if matches is None:
+                raise ValueError("CSV output requires the scan matches")
+            self.report_generator.export_csv(matches, str(file_path))
+        else:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, default=str)
         
         # Convert Path to string to avoid escape sequence issues
         file_path_str = str(file_path)
@@ -333,7 +365,7 @@ class PCIComplianceAgent:
     def _get_config_hash(self) -> str:
         """Generate hash of current configuration for audit trail"""
         config_str = json.dumps(self.config, sort_keys=True, default=str)
-        return hashlib.sha256(config_str.encode()).hexdigest()[:16]
+        return hashlib.blake2b(config_str.encode(), digest_size=8).hexdigest()
     
     def _get_config_summary(self) -> dict:
         """Get sanitized configuration summary for reporting"""
@@ -378,22 +410,19 @@ class PCIComplianceAgent:
                         self.websocket_client.emit_scan_error("Scan already in progress")
                     return
                 
-                # Start scan in background thread
-                import threading
-                self.current_scan_thread = threading.Thread(
-                    target=self._run_remote_scan,
-                    args=(directories, operator, configuration),
-                    daemon=True
+                # Hand the scan to the scan event loop
+                self.current_scan_future = asyncio.run_coroutine_threadsafe(
+                    self._async_scan(directories, operator, configuration),
+                    self._get_scan_loop()
                 )
-                self.current_scan_thread.start()
                 
             elif action == 'stop':
                 if self.scan_running:
                     logger.info("Scan stop requested")
                     self.scan_running = False
-                    # Tell scanner to stop gracefully
-                    if self.scanner:
-                        self.scanner.request_stop()
+                    # Signal the scan coroutine, which tells the scanner to stop gracefully
+                    if self._scan_loop and self._scan_stop_event:
+                        self._scan_loop.call_soon_threadsafe(self._scan_stop_event.set)
                     if self.websocket_client:
                         self.websocket_client.emit_scan_completed({
                             'status': 'stopped',
@@ -412,26 +441,49 @@ class PCIComplianceAgent:
             if self.websocket_client:
                 self.websocket_client.emit_scan_error(str(e))
     
+    def _get_scan_loop(self) -> asyncio.AbstractEventLoop:
+        """Return the event loop used for remote scans, starting it if needed"""
+        if self._scan_loop is None:
+            self._scan_loop = asyncio.new_event_loop()
+            threading.Thread(target=self._scan_loop.run_forever, daemon=True).start()
+        return self._scan_loop
+    
+    async def _async_scan(self, directories: List[str], operator: str, configuration: dict):
+        """Run a remote scan on the executor until it finishes or a stop is requested"""
+        loop = asyncio.get_running_loop()
+        self._scan_stop_event = asyncio.Event()
+        
+        scan = loop.run_in_executor(None, self._run_remote_scan, directories, operator, configuration)
+        stop = asyncio.ensure_future(self._scan_stop_event.wait())
+        
+        done, _ = await asyncio.wait({scan, stop}, return_when=asyncio.FIRST_COMPLETED)
+        if stop in done:
+            # Tell scanner to stop gracefully and wait for the worker to unwind
+            self.scanner.request_stop()
+        else:
+            stop.cancel()
+        await scan
+    
     def _run_remote_scan(self, directories: List[str], operator: str, configuration: dict):
         """Run a scan triggered remotely via WebSocket"""
         try:
             self.scan_running = True
-            logger.info(f"=== Starting Remote Scan ===")
-            logger.info(f"Operator: {operator}")
-            logger.info(f"Requested directories: {directories}")
-            logger.info(f"Configuration: {configuration}")
+            logger.info("=== Starting Remote Scan ===")
+            logger.info("Operator: %s", operator)
+            logger.info("Requested directories: %s", directories)
+            logger.info("Configuration: %s", configuration)
             
             # Start scan session with provided directories
             try:
                 scan_id = self.start_scan_session(operator, directories)
             except ValueError as e:
-                logger.error(f"Failed to start scan session: {e}")
+                logger.error("Failed to start scan session: %s", e)
                 if self.websocket_client:
                     self.websocket_client.emit_scan_error(str(e))
                 return
             
-            logger.info(f"Scan session started: {scan_id}")
-            logger.info(f"Actual directories to scan: {self.current_directories}")
+            logger.info("Scan session started: %s", scan_id)
+            logger.info("Actual directories to scan: %s", self.current_directories)
             
             # Progress callback for WebSocket updates
             def progress_callback(progress):
@@ -447,12 +499,12 @@ class PCIComplianceAgent:
                 return
             
             # Generate and save report
-            logger.info(f"Generating report for {len(matches)} matches...")
+            logger.info("Generating report for %d matches...", len(matches))
             report = self.generate_report(matches)
-            logger.info(f"Report generated - Directories scanned: {report.get('actual_directories', [])}")
+            logger.info("Report generated - Directories scanned: %s", report.get('actual_directories', []))
             
             local_path = self.save_report_locally(report)
-            logger.info(f"Report saved locally: {local_path}")
+            logger.info("Report saved locally: %s", local_path)
             
             # Send report to server
             logger.info("Sending report to server...")
@@ -460,10 +512,10 @@ class PCIComplianceAgent:
             send_error = None
             try:
                 success = self.send_report(report)
-                logger.info(f"Report sent to server: {'SUCCESS' if success else 'FAILED'}")
+                logger.info("Report sent to server: %s", 'SUCCESS' if success else 'FAILED')
             except Exception as e:
                 send_error = str(e)
-                logger.error(f"Error sending report: {e}")
+                logger.error("Error sending report: %s", e)
             
             # Always notify completion, even if report send failed
             if self.websocket_client:
@@ -481,14 +533,14 @@ class PCIComplianceAgent:
                 self.websocket_client.emit_scan_completed(completion_data)
                 logger.info("Scan completion notification sent to server")
             
-            logger.info(f"=== Remote Scan Completed ===")
-            logger.info(f"Scan ID: {scan_id}")
-            logger.info(f"Matches found: {len(matches)}")
-            logger.info(f"Directories scanned: {self.current_directories}")
-            logger.info(f"Report saved locally: {local_path}")
+            logger.info("=== Remote Scan Completed ===")
+            logger.info("Scan ID: %s", scan_id)
+            logger.info("Matches found: %d", len(matches))
+            logger.info("Directories scanned: %s", self.current_directories)
+            logger.info("Report saved locally: %s", local_path)
             
         except Exception as e:
-            logger.error(f"Remote scan failed: {e}", exc_info=True)
+            logger.error("Remote scan failed: %s", e, exc_info=True)
             if self.websocket_client:
                 self.websocket_client.emit_scan_error(str(e))
         finally:
@@ -508,13 +560,12 @@ class PCIComplianceAgent:
     def register_with_server(self) -> bool:
         """Register this agent with the central server"""
         try:
-            import platform
             registration_data = {
                 'agent_id': self.agent_id,
                 'hostname': platform.node(),
                 'version': '1.0.0',
                 'os_info': {
-                    'system': platform.system(),
+                    'system': _SYSTEM,
                     'release': platform.release(),
                     'version': platform.version(),
                     'machine': platform.machine(),
@@ -632,7 +683,7 @@ def main():
         report = agent.generate_report(matches)
         
         # Save report locally
-        local_path = agent.save_report_locally(report, args.output)
+        local_path = agent.save_report_locally(report, args.output, args.output_format, matches)
         print(f"Report saved to: {local_path}")
         
         # Send report to server (unless disabled)
@@ -645,9 +696,9 @@ def main():
         # Print summary
         print(f"\nScan Summary:")
         print(f"Scan ID: {scan_id}")
-        print(f"Files scanned: {agent.scanner.get_stats()['files_scanned']}")
+        print(f"Files scanned: {agent.last_scan_stats['files_scanned']}")
         print(f"Potential PANs found: {len(matches)}")
-        print(f"Errors: {agent.scanner.get_stats()['errors']}")
+        print(f"Errors: {agent.last_scan_stats['errors']}")
         
         # Exit with appropriate code
         sys.exit(0 if len(matches) == 0 else 1)
@@ -662,4 +713,6 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # Needed by agent.use_process_pool when running as a frozen executable
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -3,16 +3,248 @@ PCI Compliance Agent - Report Generator
 Creates secure, compliant reports from scan results
 """
 
+import re
 import json
 import hashlib
+import functools
+from collections import Counter
+from operator import attrgetter
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import List, Dict, Optional
+from typing import List, Dict, NamedTuple, Optional, Tuple
 import logging
 
-from detection_engine import PANMatch, CardType
+from detection_engine import PANMatch, CardType, make_pan_hasher
+
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is used without it
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:  # optional speedup, MatchesView falls back to lists
+    np = None
 
 logger = logging.getLogger(__name__)
 
+# Sanitization patterns, compiled once at import
+_USER_UNIX = re.compile(r'/Users/[^/]+/')
+_USER_WIN = re.compile(r'\\Users\\[^\\]+\\')
+_USER_CDRIVE = re.compile(r'C:\\Users\\[^\\]+\\')
+# Emails, SSNs and PAN-length digit runs in one pass; each match is
+# replaced by its group name
+_CTX_PAT = re.compile(
+    r'(?P<email>\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b)'
+    r'|(?P<ssn>\b\d{3}-\d{2}-\d{4}\b)'
+    r'|(?P<pan>\b[0-9]{13,19}\b)'
+)
+_CTX_MIN_LEN = 6  # Shortest possible match: an address like a@b.cc
+# Any PAN-length digit run in a free-text field (paths, operator) rules out
+# marking the report as verified-redacted
+_PAN_DIGIT_RUN = re.compile(r'[0-9]{13}')
+
+_REPORT_HASH_ALGO = "blake2b-256"
+
+_MAX_RISK_FACTORS = 10
+_STREAM_BATCH_FINDINGS = 1024  # Findings serialized per write in write_report
+
+_COMPLIANCE_NOTES_STATIC = {
+    "data_handling": "This report follows PCI-DSS data minimization principles",
+    "retention_policy": "Sensitive data is masked unless explicitly authorized",
+}
+
+# Report section schemas: (report key, source key, default)
+_SCAN_PARAM_KEYS = (
+    ("directories_scanned", "scan_directories", 0),
+    ("exclude_patterns_count", "exclude_patterns", 0),
+    ("detect_plain_pan_enabled", "detect_plain_pan", False),
+    ("action_policy", "action_policy", "report_only"),
+    ("max_file_size_mb", "max_file_size_mb", 10),
+    ("concurrency", "concurrency", 4),
+)
+_PRIVACY_KEYS = (
+    ("redact_pan", "privacy_redact_pan", True),
+    ("show_last4_only", "privacy_show_last4_only", True),
+)
+
+@functools.lru_cache(maxsize=8192)
+def _sanitize_path(file_path: str) -> str:
+    """Sanitize file paths to remove usernames (memoized; most findings share a file)"""
+    if 'Users' not in file_path:
+        return file_path  # None of the patterns can match
+    sanitized = _USER_UNIX.sub('/Users/<user>/', file_path)
+    if '\\' in sanitized:
+        sanitized = _USER_WIN.sub(r'\\Users\\<user>\\', sanitized)
+        sanitized = _USER_CDRIVE.sub(r'C:\\Users\\<user>\\', sanitized)
+    return sanitized
+
+def _dumps(obj) -> bytes:
+    """Serialize to compact JSON bytes for streamed output"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, default=str, separators=(',', ':')).encode()
+
+def _dumps_sorted(obj) -> bytes:
+    """Serialize to canonical (sorted-key) JSON bytes for hashing"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS, default=str)
+    return json.dumps(obj, sort_keys=True, default=str).encode()
+
+def _update_hash(hasher, value, depth: int):
+    """
+    Feed value into hasher piece by piece, descending `depth` levels into
+    dicts (in sorted key order) and lists before serializing whole values
+    """
+    if depth and isinstance(value, dict):
+        for key in sorted(value):
+            hasher.update(_dumps_sorted(key))
+            _update_hash(hasher, value[key], depth - 1)
+    elif depth and isinstance(value, list):
+        for item in value:
+            _update_hash(hasher, item, depth - 1)
+    else:
+        hasher.update(_dumps_sorted(value))
+
+_CARD_TYPES = tuple(CardType)
+_CARD_TYPE_IDS = {card_type: i for i, card_type in enumerate(_CARD_TYPES)}
+
+class _ViewCounts(NamedTuple):
+    card_types: Dict[str, int]  # In order of first appearance
+    luhn_valid: int
+    masked: int
+    high_confidence: int        # > 0.8
+    medium_confidence: int      # 0.5 - 0.8
+
+class MatchesView:
+    """
+    Column-oriented view of a match list. Each column is pulled out with a
+    C-level attrgetter map so counting runs over contiguous arrays (NumPy
+    when available) rather than attribute lookups on every PANMatch.
+    """
+    
+    def __init__(self, matches: List[PANMatch]):
+        self.matches = matches
+        
+        card_type_ids = map(_CARD_TYPE_IDS.__getitem__, map(attrgetter('card_type'), matches))
+        if np is not None:
+            n = len(matches)
+            self.luhn_valid = np.fromiter(map(attrgetter('luhn_valid'), matches), np.bool_, n)
+            self.is_masked = np.fromiter(map(attrgetter('is_masked'), matches), np.bool_, n)
+            # float64 keeps the 0.5/0.8 bucket edges identical to the scalar comparisons
+            self.confidence_score = np.fromiter(map(attrgetter('confidence_score'), matches), np.float64, n)
+            self.card_type_id = np.fromiter(card_type_ids, np.uint8, n)
+        else:
+            self.luhn_valid = list(map(attrgetter('luhn_valid'), matches))
+            self.is_masked = list(map(attrgetter('is_masked'), matches))
+            self.confidence_score = list(map(attrgetter('confidence_score'), matches))
+            self.card_type_id = list(card_type_ids)
+    
+    def __len__(self) -> int:
+        return len(self.matches)
+    
+    def counts(self) -> _ViewCounts:
+        """Reduce the columns to the per-category counts used by the report"""
+        if np is None:
+            return self._counts_python()
+        card_types = {}
+        if len(self.card_type_id):
+            type_ids, first_seen, type_counts = np.unique(self.card_type_id, return_index=True, return_counts=True)
+            for i in np.argsort(first_seen):
+                card_types[_CARD_TYPES[type_ids[i]].value] = int(type_counts[i])
+        scores = self.confidence_score
+        high = int(np.count_nonzero(scores > 0.8))
+        return _ViewCounts(
+            card_types,
+            int(np.count_nonzero(self.luhn_valid)),
+            int(np.count_nonzero(self.is_masked)),
+            high,
+            int(np.count_nonzero(scores > 0.5)) - high
+        )
+    
+    def _counts_python(self) -> _ViewCounts:
+        card_types = {}
+        for type_id, count in Counter(self.card_type_id).items():
+            card_types[_CARD_TYPES[type_id].value] = count
+        high = sum(1 for score in self.confidence_score if score > 0.8)
+        medium = sum(1 for score in self.confidence_score if 0.5 < score <= 0.8)
+        return _ViewCounts(card_types, sum(self.luhn_valid), sum(self.is_masked), high, medium)
+    
+    def unmasked_valid_indices(self) -> List[int]:
+        """Indices of Luhn-valid matches that are not masked, in match order"""
+        if np is None:
+            return [i for i, (valid, masked) in enumerate(zip(self.luhn_valid, self.is_masked))
+                    if valid and not masked]
+        return np.flatnonzero(self.luhn_valid & ~self.is_masked).tolist()
+
+_MAJOR_CARD_TYPES = frozenset((CardType.VISA, CardType.MASTERCARD, CardType.AMEX))
+
+# Priority and suggestions depend only on a handful of boolean features, so
+# every finding with the same features shares one cached result
+@functools.lru_cache(maxsize=None)
+def _priority_for(luhn_valid: bool, is_masked: bool, high_confidence: bool, major_card: bool) -> str:
+    """Remediation priority for a feature combination"""
+    score = 0
+    
+    # High priority factors
+    if luhn_valid:
+        score += 3
+    if not is_masked:
+        score += 2
+    if high_confidence:
+        score += 2
+    if major_card:
+        score += 1
+    
+    if score >= 5:
+        return "critical"
+    elif score >= 3:
+        return "high"
+    elif score >= 1:
+        return "medium"
+    else:
+        return "low"
+
+@functools.lru_cache(maxsize=None)
+def _suggestions_for(luhn_valid: bool, is_masked: bool, confident: bool) -> Tuple[str, ...]:
+    """Remediation suggestions for a feature combination"""
+    suggestions = []
+    
+    if not is_masked and luhn_valid:
+        suggestions.append("URGENT: Unmasked valid PAN detected - secure immediately")
+    
+    if luhn_valid:
+        suggestions.append("Implement PAN masking or tokenization")
+        suggestions.append("Review data retention policies")
+        suggestions.append("Ensure PCI-DSS compliance for data handling")
+    
+    if confident:
+        suggestions.append("High confidence match - verify and remediate")
+    
+    suggestions.append("Consider data encryption at rest")
+    suggestions.append("Implement access controls and audit logging")
+    
+    return tuple(suggestions)
+
+# CSV export, formatted to match the csv module's default (excel) dialect
+_CSV_HEADER = b"file_path,line_number,card_type,masked_number,luhn_valid,confidence_score,is_masked,priority\r\n"
+_CSV_BATCH_ROWS = 1024
+_CSV_NEEDS_QUOTING = re.compile(r'[,"\r\n]')
+
+@functools.lru_cache(maxsize=8192)
+def _csv_escape(value: str) -> str:
+    """Quote a CSV field only when it contains a delimiter, quote or newline"""
+    if _CSV_NEEDS_QUOTING.search(value):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+@dataclass
+class _ReportAnalysis:
+    """Report sections derived from the match counts"""
+    categories: dict
+    risk: dict
+    has_unmasked_valid: bool
+
 class ReportGenerator:
     """Generates PCI-compliant scan reports with security considerations"""
     
@@ -25,6 +257,8 @@ class ReportGenerator:
         self.redact_pan = self.privacy_config.get('redact_pan', True)
         self.show_last4_only = self.privacy_config.get('show_last4_only', True)
         self.hash_sensitive_data = self.privacy_config.get('hash_sensitive_data', True)
+        # Tracking hashes use the same algorithm as PANDetector.hash_pan
+        self._pan_hasher = make_pan_hasher(config)
         
         logger.info(f"ReportGenerator initialized: full_pan_allowed={self.allow_full_pan}, "
                    f"redact_pan={self.redact_pan}")
@@ -35,170 +269,278 @@ class ReportGenerator:
         """
         Create comprehensive scan report following PCI compliance guidelines
         """
+        report = self._build_report(agent_id, scan_id, operator, MatchesView(matches),
+                                    scan_stats, config_summary)
+        report["scan_results"]["findings"] = list(self._iter_findings(matches))
+        
+        # Calculate report hash for integrity
+        report["metadata"]["report_hash"] = self._hash_report(report)
+        
+        logger.info(f"Generated report for scan {scan_id}: {len(matches)} findings")
+        return report
+    
+    def write_report(self, fp, agent_id: str, scan_id: str, operator: str,
+                     matches: List[PANMatch], scan_stats: dict,
+                     config_summary: dict) -> str:
+        """
+        Stream the report as JSON to the binary file object fp without
+        materializing the processed findings. Sections are written in
+        hash order with metadata (carrying the integrity hash) last, so the
+        hash is computed on the fly. Returns the report hash, which matches
+        what create_report computes for the same content.
+        """
+        report = self._build_report(agent_id, scan_id, operator, MatchesView(matches),
+                                    scan_stats, config_summary)
+        metadata = report["metadata"]
+        scan_results = report["scan_results"]
+        hasher = hashlib.blake2b(digest_size=32)
+        write = fp.write
+        
+        # Every other section sorts before scan_results, so all of them are
+        # hashed up front, exactly as _hash_report would
+        for key in sorted(report):
+            if key == "scan_results":
+                continue
+            value = report[key]
+            if key == "metadata":
+                value = {k: v for k, v in value.items() if k != "report_hash"}
+            hasher.update(_dumps_sorted(key))
+            _update_hash(hasher, value, 3)
+        hasher.update(_dumps_sorted("scan_results"))
+        
+        write(b'{"compliance_notes":' + _dumps(report["compliance_notes"]))
+        write(b',"scan_parameters":' + _dumps(report["scan_parameters"]))
+        write(b',"scan_results":{')
+        for i, key in enumerate(sorted(scan_results)):
+            hasher.update(_dumps_sorted(key))
+            write((b',' if i else b'') + _dumps(key) + b':')
+            if key == "findings":
+                self._write_findings(write, hasher, matches)
+            else:
+                _update_hash(hasher, scan_results[key], 2)
+                write(_dumps(scan_results[key]))
+        
+        metadata["report_hash"] = hasher.hexdigest()
+        write(b'},"metadata":' + _dumps(metadata) + b'}')
+        
+        logger.info(f"Wrote report for scan {scan_id}: {len(matches)} findings")
+        return metadata["report_hash"]
+    
+    def _write_findings(self, write, hasher, matches: List[PANMatch]):
+        """Write the findings array in batches, hashing each finding as it goes"""
+        write(b'[')
+        batch = []
+        first_batch = True
+        for finding in self._iter_findings(matches):
+            # Findings sit at depth 1 below the scan_results.findings list
+            _update_hash(hasher, finding, 1)
+            batch.append(_dumps(finding))
+            if len(batch) >= _STREAM_BATCH_FINDINGS:
+                write((b'' if first_batch else b',') + b','.join(batch))
+                first_batch = False
+                batch.clear()
+        if batch:
+            write((b'' if first_batch else b',') + b','.join(batch))
+        write(b']')
+    
+    def _is_redacted(self, matches: List[PANMatch], *fields: str) -> bool:
+        """
+        Whether the report can carry no full PAN: full numbers are not
+        retained, contexts have digit runs redacted, and no file path or
+        identifier contains a PAN-length digit run. Lets the uploader skip
+        its own whole-report sensitive data scan.
+        """
+        if self.allow_full_pan and not self.redact_pan:
+            return False
+        free_text = {match.file_path for match in matches}
+        free_text.update(str(field) for field in fields)
+        return not any(_PAN_DIGIT_RUN.search(text) for text in free_text)
+    
+    def _build_report(self, agent_id: str, scan_id: str, operator: str, view: MatchesView,
+                      scan_stats: dict, config_summary: dict) -> dict:
+        """Assemble every report section except the findings list and hash"""
         timestamp = datetime.now(timezone.utc)
+        analysis = self._analyze(view)
+        total = len(view)
+        
+        scan_parameters = {name: config_summary.get(key, default) for name, key, default in _SCAN_PARAM_KEYS}
+        scan_parameters["privacy_settings"] = {
+            name: config_summary.get(key, default) for name, key, default in _PRIVACY_KEYS
+        }
+        summary = {
+            "total_files_scanned": scan_stats.get("files_scanned", 0),
+            "total_files_skipped": scan_stats.get("files_skipped", 0),
+            "total_directories_scanned": scan_stats.get("directories_scanned", 0),
+            "total_matches_found": total,
+            "errors_encountered": scan_stats.get("errors", 0),
+            "scan_duration_seconds": scan_stats.get("duration_seconds", 0)
+        }
         
-        report = {
+        compliance_notes = _COMPLIANCE_NOTES_STATIC.copy()
+        compliance_notes["audit_trail"] = f"Full audit log available for scan {scan_id}"
+        compliance_notes["recommendations"] = self._generate_recommendations(analysis.has_unmasked_valid, total)
+        
+        return {
             "metadata": {
                 "report_version": "1.0",
                 "agent_id": agent_id,
                 "scan_id": scan_id,
-                "timestamp": timestamp.isoformat(),
+                "timestamp": timestamp.isoformat(timespec='seconds'),
                 "operator": operator,
                 "report_hash": "",  # Will be calculated after report creation
+                "report_hash_algo": _REPORT_HASH_ALGO,
+                "redacted_verified": self._is_redacted(view.matches, agent_id, scan_id, operator),
             },
             
-            "scan_parameters": {
-                "directories_scanned": config_summary.get('scan_directories', 0),
-                "exclude_patterns_count": config_summary.get('exclude_patterns', 0),
-                "detect_plain_pan_enabled": config_summary.get('detect_plain_pan', False),
-                "action_policy": config_summary.get('action_policy', 'report_only'),
-                "max_file_size_mb": config_summary.get('max_file_size_mb', 10),
-                "concurrency": config_summary.get('concurrency', 4),
-                "privacy_settings": {
-                    "redact_pan": config_summary.get('privacy_redact_pan', True),
-                    "show_last4_only": config_summary.get('privacy_show_last4_only', True)
-                }
-            },
+            "scan_parameters": scan_parameters,
             
             "scan_results": {
-                "summary": {
-                    "total_files_scanned": scan_stats.get('files_scanned', 0),
-                    "total_files_skipped": scan_stats.get('files_skipped', 0),
-                    "total_directories_scanned": scan_stats.get('directories_scanned', 0),
-                    "total_matches_found": len(matches),
-                    "errors_encountered": scan_stats.get('errors', 0),
-                    "scan_duration_seconds": scan_stats.get('duration_seconds', 0)
-                },
+                "summary": summary,
                 
-                "findings_by_type": self._categorize_findings(matches),
+                "findings_by_type": analysis.categories,
                 
-                "findings": self._process_findings(matches),
+                "findings": [],  # Filled by the caller
                 
-                "risk_assessment": self._assess_risk(matches)
+                "risk_assessment": analysis.risk
             },
             
-            "compliance_notes": {
-                "data_handling": "This report follows PCI-DSS data minimization principles",
-                "retention_policy": "Sensitive data is masked unless explicitly authorized",
-                "audit_trail": f"Full audit log available for scan {scan_id}",
-                "recommendations": self._generate_recommendations(matches)
-            }
+            "compliance_notes": compliance_notes
         }
+    
+    def _hash_report(self, report: dict) -> str:
+        """
+        Compute the report integrity hash section by section so the full
+        report is never serialized into one buffer. The report_hash
+        placeholder itself is excluded from the hash input.
         
-        # Calculate report hash for integrity
-        report_json = json.dumps(report, sort_keys=True, default=str)
-        report["metadata"]["report_hash"] = hashlib.sha256(report_json.encode()).hexdigest()
-        
-        logger.info(f"Generated report for scan {scan_id}: {len(matches)} findings")
-        return report
+        This is an integrity checksum rather than a PAN hash, so it uses
+        BLAKE2b-256; PAN hashes stay SHA-256.
+        """
+        hasher = hashlib.blake2b(digest_size=32)
+        for key in sorted(report):
+            value = report[key]
+            if key == "metadata":
+                value = {k: v for k, v in value.items() if k != "report_hash"}
+            hasher.update(_dumps_sorted(key))
+            # Depth 3 reaches individual findings under scan_results.findings
+            _update_hash(hasher, value, 3)
+        return hasher.hexdigest()
     
-    def _categorize_findings(self, matches: List[PANMatch]) -> dict:
-        """Categorize findings by card type, validation status, etc."""
-        categories = {
-            "by_card_type": {},
-            "by_validation_status": {
-                "luhn_valid": 0,
-                "luhn_invalid": 0
-            },
-            "by_confidence": {
-                "high": 0,    # > 0.8
-                "medium": 0,  # 0.5 - 0.8
-                "low": 0      # < 0.5
-            },
-            "by_masking_status": {
-                "masked": 0,
-                "unmasked": 0
-            }
-        }
+    def _iter_findings(self, matches: List[PANMatch]):
+        """Yield the privacy-controlled finding dict for each match"""
+        include_full_pan = self.allow_full_pan and not self.redact_pan
+        sanitize_context = self._sanitize_context
+        
+        pan_hashes = {}  # Each distinct PAN is hashed once; numbers often recur
         
         for match in matches:
-            # Card type categorization
             card_type = match.card_type.value
-            categories["by_card_type"][card_type] = categories["by_card_type"].get(card_type, 0) + 1
-            
-            # Validation status
-            if match.luhn_valid:
-                categories["by_validation_status"]["luhn_valid"] += 1
-            else:
-                categories["by_validation_status"]["luhn_invalid"] += 1
-            
-            # Confidence level
-            if match.confidence_score > 0.8:
-                categories["by_confidence"]["high"] += 1
-            elif match.confidence_score > 0.5:
-                categories["by_confidence"]["medium"] += 1
-            else:
-                categories["by_confidence"]["low"] += 1
+            raw_match = match.raw_match
+            pan_hash = None
+            if raw_match:
+                pan_hash = pan_hashes.get(raw_match)
+                if pan_hash is None:
+                    hasher = self._pan_hasher.copy()
+                    hasher.update(raw_match.encode())
+                    pan_hash = pan_hashes[raw_match] = hasher.hexdigest()
             
-            # Masking status
-            if match.is_masked:
-                categories["by_masking_status"]["masked"] += 1
-            else:
-                categories["by_masking_status"]["unmasked"] += 1
-        
-        return categories
-    
-    def _process_findings(self, matches: List[PANMatch]) -> List[dict]:
-        """Process findings with appropriate privacy controls"""
-        processed_findings = []
-        
-        for match in matches:
             finding = {
-                "file_path": self._sanitize_file_path(match.file_path),
+                "file_path": _sanitize_path(match.file_path),
                 "line_number": match.line_number,
                 "column_range": [match.column_start, match.column_end],
-                "card_type": match.card_type.value,
+                "card_type": card_type,
                 "luhn_valid": match.luhn_valid,
                 "confidence_score": round(match.confidence_score, 3),
                 "is_masked": match.is_masked,
                 "context": {
-                    "before": self._sanitize_context(match.context_before),
-                    "after": self._sanitize_context(match.context_after)
+                    "before": sanitize_context(match.context_before),
+                    "after": sanitize_context(match.context_after)
                 },
                 "remediation_priority": self._calculate_priority(match),
                 "remediation_suggestions": self._get_remediation_suggestions(match)
             }
             
             # Handle PAN data based on privacy settings
-            if self.allow_full_pan and not self.redact_pan:
+            if include_full_pan:
                 # Only include if explicitly authorized
                 finding["pan_data"] = {
-                    "full_number": match.raw_match,
+                    "full_number": raw_match,
                     "masked_number": match.masked_match,
-                    "hash": hashlib.sha256(match.raw_match.encode()).hexdigest() if match.raw_match else None
+                    "hash": pan_hash
                 }
                 logger.warning(f"Including full PAN in report for {match.file_path}:{match.line_number}")
             else:
                 # Safe default - only masked/hashed data
                 finding["pan_data"] = {
                     "masked_number": match.masked_match,
-                    "hash": hashlib.sha256(match.raw_match.encode()).hexdigest() if match.raw_match else None
+                    "hash": pan_hash
                 }
             
-            processed_findings.append(finding)
+            yield finding
+    
+    def _analyze(self, view: MatchesView) -> _ReportAnalysis:
+        """
+        Produce the categorized counts and the risk assessment from the
+        view's columns, without walking the match objects
+        """
+        matches = view.matches
+        total = len(view)
+        counts = view.counts()
+        luhn_valid_count = counts.luhn_valid
+        masked_count = counts.masked
+        high = counts.high_confidence
+        medium = counts.medium_confidence
+        unmasked_valid = view.unmasked_valid_indices()
+        high_risk_count = len(unmasked_valid)
+        
+        # One factor per file, stopping once the report limit is reached
+        risk_factors = []
+        seen_files = set()
+        for i in unmasked_valid:
+            path = matches[i].file_path
+            if path not in seen_files:
+                seen_files.add(path)
+                risk_factors.append(f"Unmasked valid PAN in {path}")
+                if len(risk_factors) >= _MAX_RISK_FACTORS:
+                    break
         
-        return processed_findings
+        categories = {
+            "by_card_type": counts.card_types,
+            "by_validation_status": {
+                "luhn_valid": luhn_valid_count,
+                "luhn_invalid": total - luhn_valid_count
+            },
+            "by_confidence": {
+                "high": high,                       # > 0.8
+                "medium": medium,                   # 0.5 - 0.8
+                "low": total - high - medium        # < 0.5
+            },
+            "by_masking_status": {
+                "masked": masked_count,
+                "unmasked": total - masked_count
+            }
+        }
+        
+        return _ReportAnalysis(
+            categories=categories,
+            risk=self._assess_risk(total, high_risk_count, risk_factors),
+            has_unmasked_valid=high_risk_count > 0
+        )
     
     def _sanitize_file_path(self, file_path: str) -> str:
         """Sanitize file paths to remove sensitive information"""
-        # Remove username from path if present
-        import re
-        sanitized = re.sub(r'/Users/[^/]+/', '/Users/<user>/', file_path)
-        sanitized = re.sub(r'\\Users\\[^\\]+\\', r'\\Users\\<user>\\', sanitized)
-        sanitized = re.sub(r'C:\\Users\\[^\\]+\\', r'C:\\Users\\<user>\\', sanitized)
-        return sanitized
+        return _sanitize_path(file_path)
     
     def _sanitize_context(self, context: str) -> str:
         """Remove potential sensitive data from context"""
         if not context:
             return ""
         
-        # Remove potential email addresses
-        import re
-        sanitized = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '<email>', context)
-        
-        # Remove potential SSNs
-        sanitized = re.sub(r'\b\d{3}-\d{2}-\d{4}\b', '<ssn>', sanitized)
+        # Remove potential email addresses and SSNs
+        if len(context) < _CTX_MIN_LEN:
+            sanitized = context
+        else:
+            sanitized = _CTX_PAT.sub(lambda m: f"<{m.lastgroup}>", context)
         
         # Limit context length
         if len(sanitized) > 200:
@@ -208,72 +550,30 @@ class ReportGenerator:
     
     def _calculate_priority(self, match: PANMatch) -> str:
         """Calculate remediation priority based on risk factors"""
-        score = 0
-        
-        # High priority factors
-        if match.luhn_valid:
-            score += 3
-        if not match.is_masked:
-            score += 2
-        if match.confidence_score > 0.8:
-            score += 2
-        if match.card_type in [CardType.VISA, CardType.MASTERCARD, CardType.AMEX]:
-            score += 1
-        
-        if score >= 5:
-            return "critical"
-        elif score >= 3:
-            return "high"
-        elif score >= 1:
-            return "medium"
-        else:
-            return "low"
+        return _priority_for(match.luhn_valid, match.is_masked,
+                             match.confidence_score > 0.8, match.card_type in _MAJOR_CARD_TYPES)
     
-    def _get_remediation_suggestions(self, match: PANMatch) -> List[str]:
-        """Generate specific remediation suggestions"""
-        suggestions = []
-        
-        if not match.is_masked and match.luhn_valid:
-            suggestions.append("URGENT: Unmasked valid PAN detected - secure immediately")
-        
-        if match.luhn_valid:
-            suggestions.append("Implement PAN masking or tokenization")
-            suggestions.append("Review data retention policies")
-            suggestions.append("Ensure PCI-DSS compliance for data handling")
-        
-        if match.confidence_score > 0.7:
-            suggestions.append("High confidence match - verify and remediate")
-        
-        suggestions.append("Consider data encryption at rest")
-        suggestions.append("Implement access controls and audit logging")
-        
-        return suggestions
+    def _get_remediation_suggestions(self, match: PANMatch) -> Tuple[str, ...]:
+        """Generate specific remediation suggestions (shared, immutable)"""
+        return _suggestions_for(match.luhn_valid, match.is_masked, match.confidence_score > 0.7)
     
-    def _assess_risk(self, matches: List[PANMatch]) -> dict:
-        """Assess overall risk based on findings"""
-        if not matches:
+    def _assess_risk(self, total: int, high_risk_count: int, risk_factors: List[str]) -> dict:
+        """Assess overall risk from the counts gathered by _analyze"""
+        if not total:
             return {
                 "overall_risk": "low",
                 "risk_factors": [],
                 "compliance_status": "compliant"
             }
         
-        risk_factors = []
-        high_risk_count = 0
-        
-        for match in matches:
-            if match.luhn_valid and not match.is_masked:
-                high_risk_count += 1
-                risk_factors.append(f"Unmasked valid PAN in {match.file_path}")
-        
         # Determine overall risk
         if high_risk_count > 0:
             overall_risk = "critical"
             compliance_status = "non-compliant"
-        elif len(matches) > 10:
+        elif total > 10:
             overall_risk = "high"
             compliance_status = "review-required"
-        elif len(matches) > 0:
+        elif total > 0:
             overall_risk = "medium"
             compliance_status = "review-required"
         else:
@@ -282,12 +582,12 @@ class ReportGenerator:
         
         return {
             "overall_risk": overall_risk,
-            "risk_factors": risk_factors[:10],  # Limit to top 10
+            "risk_factors": risk_factors[:_MAX_RISK_FACTORS],
             "compliance_status": compliance_status,
             "total_high_risk_findings": high_risk_count
         }
     
-    def _generate_recommendations(self, matches: List[PANMatch]) -> List[str]:
+    def _generate_recommendations(self, has_unmasked_valid: bool, total: int) -> List[str]:
         """Generate high-level compliance recommendations"""
         recommendations = [
             "Implement regular PCI compliance scanning",
@@ -296,37 +596,33 @@ class ReportGenerator:
             "Enable comprehensive audit logging"
         ]
         
-        if any(not match.is_masked and match.luhn_valid for match in matches):
+        if has_unmasked_valid:
             recommendations.insert(0, "CRITICAL: Secure unmasked PANs immediately")
             recommendations.insert(1, "Implement PAN masking/tokenization solution")
         
-        if len(matches) > 5:
+        if total > 5:
             recommendations.append("Consider automated PAN discovery and classification")
         
         return recommendations
     
     def export_csv(self, matches: List[PANMatch], file_path: str):
         """Export findings to CSV format for analysis"""
-        import csv
+        calculate_priority = self._calculate_priority
         
-        with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = [
-                'file_path', 'line_number', 'card_type', 'masked_number',
-                'luhn_valid', 'confidence_score', 'is_masked', 'priority'
-            ]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            
+        with open(file_path, 'wb') as csvfile:
+            csvfile.write(_CSV_HEADER)
+            rows = []
             for match in matches:
-                writer.writerow({
-                    'file_path': self._sanitize_file_path(match.file_path),
-                    'line_number': match.line_number,
-                    'card_type': match.card_type.value,
-                    'masked_number': match.masked_match,
-                    'luhn_valid': match.luhn_valid,
-                    'confidence_score': match.confidence_score,
-                    'is_masked': match.is_masked,
-                    'priority': self._calculate_priority(match)
-                })
+                rows.append(
+                    f"{_csv_escape(_sanitize_path(match.file_path))},{match.line_number},"
+                    f"{_csv_escape(match.card_type.value)},{_csv_escape(match.masked_match)},"
+                    f"{match.luhn_valid},{match.confidence_score!r},{match.is_masked},"
+                    f"{calculate_priority(match)}\r\n"
+                )
+                if len(rows) >= _CSV_BATCH_ROWS:
+                    csvfile.write(''.join(rows).encode('utf-8'))
+                    rows.clear()
+            if rows:
+                csvfile.write(''.join(rows).encode('utf-8'))
         
         logger.info(f"Exported {len(matches)} findings to CSV: {file_path}")
\ No newline at end of file
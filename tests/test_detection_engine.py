@@ -3,6 +3,7 @@ PCI Compliance Agent - Test Suite for Detection Engine
 """
 
 import pytest
+import random
 import tempfile
 import os
 from detection_engine import PANDetector, CardType, PANMatch
@@ -206,6 +207,37 @@ class TestFileValidation:
             finally:
                 os.unlink(f.name)
 
+class TestBatchLuhn:
+    """Test batched Luhn validation"""
+    
+    def test_luhn_check_many_matches_luhn_check(self, detector):
+        """Batched results equal one-at-a-time results, on both code paths"""
+        rng = random.Random(7)
+        numbers = [''.join(rng.choice('0123456789') for _ in range(16)) for _ in range(200)]
+        numbers += ['4532015112830366', '5555555555554444', '378282246310005', '4532-0151-1283-0366', '']
+        numbers += [''.join(rng.choice('0123456789') for _ in range(rng.randint(13, 19))) for _ in range(50)]
+        
+        assert detector.luhn_check_many(numbers) == [detector.luhn_check(n) for n in numbers]
+
+class TestCardTypeLookup:
+    """Test the BIN range lookup in detect_card_type"""
+    
+    def test_bin_lookup_matches_card_patterns(self, detector):
+        """The bisect lookup agrees with trying each card pattern in turn"""
+        def by_pattern(digits):
+            for card_type, pattern in detector.compiled_patterns.items():
+                if pattern.match(digits):
+                    return card_type
+            return CardType.UNKNOWN
+        
+        prefixes = set()
+        for low, high, _, _ in detector.BIN_RANGES:
+            prefixes.update((low - 1, low, high, high + 1))
+        for prefix in sorted(prefixes):
+            for length in range(13, 20):
+                digits = (str(prefix) + '0' * length)[:length]
+                assert detector.detect_card_type(digits) == by_pattern(digits), digits
+
 class TestSecurityFeatures:
     """Test security-related features"""
     
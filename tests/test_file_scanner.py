@@ -0,0 +1,117 @@
+"""
+PCI Compliance Agent - Test Suite for File Scanner
+"""
+
+import pytest
+import os
+import file_scanner
+from file_scanner import FileScanner
+from detection_engine import PANDetector
+
+@pytest.fixture
+def config():
+    """Test configuration"""
+    return {
+        'agent': {
+            'concurrency': 2,
+            'exclude_patterns': []
+        },
+        'detection': {
+            'minimum_confidence_score': 0.7
+        }
+    }
+
+@pytest.fixture
+def scanner(config):
+    """File scanner instance"""
+    return FileScanner(config, PANDetector(config))
+
+def write_pan_file(path, lines=20):
+    with open(path, 'w') as f:
+        for i in range(lines):
+            f.write(f"card number 4532015112830366 row {i}\n")
+
+class TestBatchedReading:
+    """Test reading files in batches of whole lines"""
+
+    def test_batches_match_whole_file_scan(self, scanner, tmp_path, monkeypatch):
+        """Line numbers stay file-relative across batches"""
+        path = str(tmp_path / "cards.txt")
+        write_pan_file(path)
+        monkeypatch.setattr(file_scanner, '_READ_BATCH_CHARS', 64)
+
+        matches = scanner.scan_file(path)
+
+        assert [m.line_number for m in matches] == list(range(1, 21))
+
+    def test_read_error_after_first_batch_does_not_rescan(self, scanner, tmp_path, monkeypatch):
+        """A failure partway through must not re-read the file with another encoding"""
+        path = str(tmp_path / "cards.txt")
+        write_pan_file(path)
+        monkeypatch.setattr(file_scanner, '_READ_BATCH_CHARS', 64)
+
+        real_open = open
+
+        class FailingFile:
+            def __init__(self, f):
+                self.f = f
+                self.reads = 0
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self.f.close()
+
+            def readlines(self, hint):
+                self.reads += 1
+                if self.reads == 3:
+                    raise OSError("simulated read failure")
+                return self.f.readlines(hint)
+
+        monkeypatch.setattr(file_scanner, 'open', lambda *a, **k: FailingFile(real_open(*a, **k)), raising=False)
+
+        matches = scanner.scan_file(path)
+        lines = [m.line_number for m in matches]
+
+        assert lines
+        assert len(lines) == len(set(lines))
+        assert scanner.get_stats()['errors'] == 1
+
+class TestProcessPool:
+    """Test scanning with agent.use_process_pool"""
+
+    def make_tree(self, root, files=6):
+        for i in range(files):
+            write_pan_file(str(root / f"cards{i}.txt"), lines=i + 1)
+        return str(root)
+
+    def test_process_pool_matches_thread_pool(self, config, tmp_path):
+        """Worker processes find the same matches and stats as threads"""
+        directory = self.make_tree(tmp_path)
+        threaded = FileScanner(config, PANDetector(config))
+        config['agent']['use_process_pool'] = True
+        pooled = FileScanner(config, PANDetector(config))
+
+        expected = threaded.scan_directories([directory])
+        matches = pooled.scan_directories([directory])
+
+        key = lambda m: (m.file_path, m.line_number)
+        assert sorted(map(key, matches)) == sorted(map(key, expected))
+        assert pooled.get_stats()['files_scanned'] == threaded.get_stats()['files_scanned'] == 6
+        assert pooled.get_stats()['matches_found'] == len(expected)
+
+    def test_stop_skips_remaining_files(self, config, tmp_path):
+        """Files still queued when a stop is requested are not scanned"""
+        directory = self.make_tree(tmp_path, files=20)
+        config['agent']['use_process_pool'] = True
+        pooled = FileScanner(config, PANDetector(config))
+
+        def stop_after_first(progress):
+            if progress.get('files_scanned'):
+                pooled.request_stop()
+
+        pooled.scan_directories([directory], progress_callback=stop_after_first)
+
+        assert pooled.stop_requested
+        assert 0 < pooled.get_stats()['files_scanned'] < 20
@@ -0,0 +1,76 @@
+"""
+PCI Compliance Agent - Test Suite for Report Generator
+"""
+
+import io
+import json
+import hashlib
+import pytest
+from datetime import datetime, timezone
+import report_generator
+from report_generator import ReportGenerator
+from detection_engine import PANDetector
+
+@pytest.fixture
+def config():
+    """Test configuration"""
+    return {
+        'detection': {
+            'minimum_confidence_score': 0.7
+        },
+        'privacy': {
+            'allow_full_pan_retention': False,
+            'show_last4_only': True
+        }
+    }
+
+@pytest.fixture
+def generator(config, monkeypatch):
+    """Report generator with a fixed report timestamp"""
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    
+    monkeypatch.setattr(report_generator, 'datetime', FixedDatetime)
+    return ReportGenerator(config)
+
+@pytest.fixture
+def matches(config):
+    """Matches from enough lines to span several streamed batches"""
+    text = '\n'.join(f"payment card 4532015112830366 order {i}" for i in range(1200))
+    return PANDetector(config).scan_text(text, '/data/orders.log')
+
+class TestStreamedReport:
+    """Test write_report against create_report"""
+    
+    def test_write_report_matches_create_report(self, generator, matches):
+        """The streamed report and its hash equal the in-memory report"""
+        args = ('agent-1', 'scan-1', 'operator', matches,
+                {'files_scanned': 1, 'duration_seconds': 2.5}, {'directories': ['/data']})
+        report = generator.create_report(*args)
+        fp = io.BytesIO()
+        
+        report_hash = generator.write_report(fp, *args)
+        
+        assert report_hash == report['metadata']['report_hash']
+        assert json.loads(fp.getvalue()) == json.loads(json.dumps(report))
+
+class TestPanHashes:
+    """Test the tracking hashes in report findings"""
+    
+    @pytest.mark.parametrize('algorithm, hasher', [
+        ('sha256', hashlib.sha256),
+        ('blake2b-256', lambda data: hashlib.blake2b(data, digest_size=32)),
+    ])
+    def test_pan_hash_uses_configured_algorithm(self, algorithm, hasher):
+        """privacy.pan_hash_algorithm selects the hash in each finding"""
+        config = {'privacy': {'allow_full_pan_retention': True, 'pan_hash_algorithm': algorithm}}
+        detector = PANDetector(config)
+        matches = detector.scan_text("card 4532015112830366", '/data/orders.log')
+        
+        report = ReportGenerator(config).create_report('agent-1', 'scan-1', 'operator', matches, {}, {})
+        
+        pan_hashes = [f['pan_data']['hash'] for f in report['scan_results']['findings']]
+        assert pan_hashes == [hasher(b'4532015112830366').hexdigest()]
+        assert pan_hashes == [detector.hash_pan('4532015112830366')]
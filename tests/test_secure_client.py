@@ -0,0 +1,109 @@
+"""
+PCI Compliance Agent - Test Suite for Secure Client
+"""
+
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import secure_client
+from secure_client import SecureClient
+from report_generator import ReportGenerator
+
+@pytest.fixture
+def server():
+    """Local report server without a batch endpoint"""
+    received = []
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            received.append((self.path, body))
+            status = 404 if self.path.endswith('/batch') else 201
+            payload = json.dumps({'report_id': len(received)}).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        
+        def log_message(self, *args):
+            pass
+    
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}", received
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def make_client():
+    """Build clients and drop their shared sessions afterwards"""
+    def make(**reporting):
+        reporting.setdefault('compress_requests', False)
+        return SecureClient({'reporting': reporting})
+    yield make
+    SecureClient.clear_shared_sessions()
+
+def make_report(scan_id):
+    report = ReportGenerator({}).create_report('agent-1', scan_id, 'operator', [], {}, {})
+    report['actual_directories'] = ['/data']
+    return report
+
+class TestBatchUpload:
+    """Test sending several reports at once"""
+    
+    def test_falls_back_to_single_reports_on_404(self, server, make_client):
+        """Without a batch endpoint each report is posted on its own, in order"""
+        url, received = server
+        client = make_client(server_url=url, max_requests_per_minute=600)
+        
+        results = client.send_reports_batch([make_report('scan-1'), make_report('scan-2')])
+        
+        assert results == [True, True]
+        assert [path for path, _ in received] == ['/api/reports/batch', '/api/reports', '/api/reports']
+        assert [body['metadata']['scan_id'] for _, body in received[1:]] == ['scan-1', 'scan-2']
+
+class TestReportValidation:
+    """Test the sensitive data check before upload"""
+    
+    def test_redacted_verified_skips_full_scan(self, make_client):
+        """Only the directories main.py adds are checked on verified reports"""
+        client = make_client()
+        report = make_report('scan-1')
+        report['compliance_notes']['note'] = 'card 4532015112830366'
+        
+        report['metadata']['redacted_verified'] = True
+        assert client._validate_report(report)
+        
+        report['metadata']['redacted_verified'] = False
+        assert not client._validate_report(report)
+    
+    def test_redacted_verified_still_checks_directories(self, make_client):
+        """A PAN in a scanned directory name is still caught"""
+        client = make_client()
+        report = make_report('scan-1')
+        report['metadata']['redacted_verified'] = True
+        report['actual_directories'] = ['/exports/4532015112830366']
+        
+        assert not client._validate_report(report)
+
+class TestRateLimit:
+    """Test the token bucket rate limiter"""
+    
+    def test_burst_then_paced(self, make_client, monkeypatch):
+        """A full minute's quota goes out at once, then one per refill interval"""
+        sleeps = []
+        monkeypatch.setattr(secure_client.time, 'sleep', sleeps.append)
+        client = make_client(max_requests_per_minute=60)
+        
+        for _ in range(60):
+            client._check_rate_limit()
+        assert sleeps == []
+        
+        client._check_rate_limit()
+        client._check_rate_limit()
+        assert len(sleeps) == 2
+        assert 0.9 < sleeps[0] <= 1.1
+        assert 1.9 < sleeps[1] <= 2.1
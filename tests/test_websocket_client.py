@@ -0,0 +1,142 @@
+"""
+PCI Compliance Agent - Test Suite for WebSocket Client
+"""
+
+import time
+import threading
+import pytest
+import websocket_client
+from websocket_client import AgentWebSocketClient
+
+@pytest.fixture
+def client():
+    """WebSocket client that records emits instead of sending them"""
+    client = AgentWebSocketClient({}, 'agent-1')
+    client.sent = []
+    client.sio.emit = lambda event, payload=None: client.sent.append((event, payload))
+    yield client
+    client._stop_heartbeat()
+
+def reconnect(client):
+    """Run the socket.io connect handler as a reconnect would"""
+    client.sio.handlers['/']['connect']()
+
+def scan_events(client):
+    return [(event, payload) for event, payload in client.sent
+            if event not in ('join-agent', 'heartbeat')]
+
+class TestReplayQueue:
+    """Test queueing messages while disconnected"""
+
+    def test_replay_in_order_on_reconnect(self, client):
+        """Queued messages are sent oldest first after joining the agent room"""
+        client.emit_scan_error('first')
+        client.emit_scan_completed({'scan_id': 'second'})
+
+        reconnect(client)
+
+        assert client.sent[0] == ('join-agent', 'agent-1')
+        events = scan_events(client)
+        assert [event for event, _ in events] == ['scan-error', 'scan-completed']
+        assert events[0][1]['error'] == 'first'
+        assert events[1][1]['results'] == {'scan_id': 'second'}
+
+    def test_status_response_not_replayed(self, client):
+        """A status reply is only meaningful to the request it answers"""
+        client.emit_scan_status({'scanning': True})
+
+        reconnect(client)
+
+        assert scan_events(client) == []
+
+    def test_only_latest_progress_replayed(self, client):
+        """Older progress updates are superseded while disconnected"""
+        client._send_scan_progress({'phase': 'scanning', 'files_scanned': 1})
+        client.emit_scan_error('failed')
+        client._send_scan_progress({'phase': 'scanning', 'files_scanned': 2})
+
+        reconnect(client)
+
+        events = scan_events(client)
+        assert [event for event, _ in events] == ['scan-error', 'scan-progress']
+        assert events[1][1]['progress']['files_scanned'] == 2
+
+    def test_emit_during_replay_waits_for_backlog(self, client):
+        """A live emit arriving mid-replay is sent after the queued messages"""
+        client.emit_scan_error('first')
+        client._send_scan_progress({'phase': 'scanning', 'files_scanned': 1})
+        live = threading.Thread(target=client.emit_scan_completed, args=({'scan_id': 'live'},))
+        record = client.sio.emit
+        
+        def emit(event, payload=None):
+            record(event, payload)
+            if event == 'scan-error':
+                # The scan thread emits while the reconnect is still replaying
+                live.start()
+                time.sleep(0.05)
+        
+        client.sio.emit = emit
+        reconnect(client)
+        live.join()
+        
+        events = [event for event, _ in scan_events(client)]
+        assert events == ['scan-error', 'scan-progress', 'scan-completed']
+    
+    def test_failed_emit_is_kept_for_replay(self, client):
+        """A message whose emit fails while connected is replayed later"""
+        client.connected = True
+        
+        def fail(event, payload=None):
+            raise ConnectionError("socket closed")
+        
+        record = client.sio.emit
+        client.sio.emit = fail
+        client.emit_scan_completed({'scan_id': 'scan-1'})
+        client.sio.emit = record
+        reconnect(client)
+        
+        assert [event for event, _ in scan_events(client)] == ['scan-completed']
+
+class TestProgressCoalescing:
+    """Test throttling of scan progress updates"""
+    
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(websocket_client.time, 'monotonic', lambda: now[0])
+        return now
+    
+    def progress_sent(self, client):
+        return [payload['progress'] for event, payload in client.sent if event == 'scan-progress']
+    
+    def test_updates_within_interval_are_coalesced(self, client, clock):
+        """Only the newest held-back update goes out once the interval passes"""
+        client.connected = True
+        for files in range(1, 4):
+            client.emit_scan_progress({'phase': 'scanning', 'files_scanned': files})
+        assert [p['files_scanned'] for p in self.progress_sent(client)] == [1]
+        
+        clock[0] += websocket_client._PROGRESS_INTERVAL
+        client.emit_scan_progress({'phase': 'scanning', 'files_scanned': 4})
+        assert [p['files_scanned'] for p in self.progress_sent(client)] == [1, 4]
+    
+    def test_phase_change_is_sent_at_once(self, client, clock):
+        """A new phase is never held back"""
+        client.connected = True
+        client.emit_scan_progress({'phase': 'counting'})
+        client.emit_scan_progress({'phase': 'scanning'})
+        
+        assert [p['phase'] for p in self.progress_sent(client)] == ['counting', 'scanning']
+    
+    def test_flush_sends_held_back_update(self, client, clock):
+        """flush_scan_progress sends the pending update once, before completion"""
+        client.connected = True
+        client.emit_scan_progress({'phase': 'scanning', 'files_scanned': 1})
+        client.emit_scan_progress({'phase': 'scanning', 'files_scanned': 2})
+        
+        client.emit_scan_completed({'scan_id': 'scan-1'})
+        client.flush_scan_progress()
+        
+        events = [event for event, _ in client.sent]
+        assert events == ['scan-progress', 'scan-progress', 'scan-completed']
+        assert [p['files_scanned'] for p in self.progress_sent(client)] == [1, 2]
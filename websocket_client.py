@@ -7,11 +7,46 @@ import logging
 import socketio
 import threading
 import time
+from collections import deque
 from typing import Callable, Optional
 import json
 
+try:
+    import orjson
+except ImportError:  # optional speedup, socketio's stdlib json is used without it
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+class _OrjsonModule:
+    """
+    json-module stand-in for socketio packet encoding backed by orjson.
+    Anything orjson rejects is left to the stdlib so behaviour matches.
+    """
+    
+    @staticmethod
+    def dumps(obj, **kwargs) -> str:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            return json.dumps(obj, **kwargs)
+    
+    @staticmethod
+    def loads(s, **kwargs):
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            return json.loads(s, **kwargs)
+
+# Progress updates within this many seconds of the last one sent are
+# coalesced; only the newest is kept and sent later
+_PROGRESS_INTERVAL = 0.25
+
+# Fire-and-forget messages (results, errors, progress) emitted while
+# disconnected are kept for replay on reconnect, oldest dropped first beyond
+# this many. Status replies answer a request and are never replayed
+_REPLAY_QUEUE_SIZE = 100
+
 class AgentWebSocketClient:
     """WebSocket client for real-time communication with the server"""
     
@@ -26,14 +61,24 @@ class AgentWebSocketClient:
             reconnection_attempts=5,
             reconnection_delay=2,
             logger=False,  # Disable socketio logging to avoid noise
-            engineio_logger=False
+            engineio_logger=False,
+            json=_OrjsonModule if orjson is not None else None
         )
         
         # Callback handlers
         self.scan_command_handler: Optional[Callable] = None
         self.connected = False
         self.heartbeat_thread = None
-        self.stop_heartbeat = False
+        self.stop_heartbeat = threading.Event()
+        
+        # Progress coalescing state
+        self._pending_progress: Optional[dict] = None
+        self._last_progress_emit = 0.0
+        self._last_progress_phase = None
+        self._progress_lock = threading.Lock()
+        self._replay_queue = deque(maxlen=_REPLAY_QUEUE_SIZE)
+        # The scan thread queues while the socket.io thread replays
+        self._replay_lock = threading.Lock()
         
         # Setup event handlers
         self._setup_event_handlers()
@@ -47,6 +92,7 @@ class AgentWebSocketClient:
             self.connected = True
             # Join the agent room for receiving commands
             self.sio.emit('join-agent', self.agent_id)
+            self._replay_queued()
             # Start heartbeat
             self._start_heartbeat()
             
@@ -82,10 +128,13 @@ class AgentWebSocketClient:
     
     def _start_heartbeat(self):
         """Start sending heartbeats to server every 30 seconds"""
-        self.stop_heartbeat = False
+        # Each thread gets its own stop event, so a thread left over from a
+        # previous connection cannot be revived by a reconnect
+        self.stop_heartbeat.set()
+        stop = self.stop_heartbeat = threading.Event()
         
         def send_heartbeat():
-            while not self.stop_heartbeat and self.connected:
+            while not stop.is_set() and self.connected:
                 try:
                     self.sio.emit('heartbeat', {
                         'agent_id': self.agent_id,
@@ -95,11 +144,8 @@ class AgentWebSocketClient:
                 except Exception as e:
                     logger.error(f"Failed to send heartbeat: {e}")
                 
-                # Wait 30 seconds before next heartbeat
-                for _ in range(30):
-                    if self.stop_heartbeat:
-                        break
-                    time.sleep(1)
+                # Wait 30 seconds before next heartbeat, waking at once on stop
+                stop.wait(30)
         
         self.heartbeat_thread = threading.Thread(target=send_heartbeat, daemon=True)
         self.heartbeat_thread.start()
@@ -107,7 +153,7 @@ class AgentWebSocketClient:
     
     def _stop_heartbeat(self):
         """Stop the heartbeat thread"""
-        self.stop_heartbeat = True
+        self.stop_heartbeat.set()
         if self.heartbeat_thread:
             logger.info("Stopping heartbeat thread")
     
@@ -139,52 +185,107 @@ class AgentWebSocketClient:
         self.scan_command_handler = handler
     
     def emit_scan_progress(self, progress_data: dict):
-        """Emit scan progress update to the server"""
-        try:
-            if self.connected:
-                self.sio.emit('scan-progress', {
-                    'agent_id': self.agent_id,
-                    'progress': progress_data,
-                    'timestamp': time.time()
-                })
-        except Exception as e:
-            logger.error(f"Failed to emit scan progress: {e}")
+        """
+        Emit scan progress update to the server. Updates arriving less than
+        _PROGRESS_INTERVAL after the last one sent are held back, and only
+        the newest is sent; a phase change is always sent at once.
+        """
+        now = time.monotonic()
+        phase = progress_data.get('phase')
+        with self._progress_lock:
+            if phase == self._last_progress_phase and now - self._last_progress_emit < _PROGRESS_INTERVAL:
+                self._pending_progress = progress_data
+                return
+            self._pending_progress = None
+            self._last_progress_emit = now
+            self._last_progress_phase = phase
+        self._send_scan_progress(progress_data)
+    
+    def flush_scan_progress(self):
+        """Send any progress update held back by emit_scan_progress"""
+        with self._progress_lock:
+            progress_data, self._pending_progress = self._pending_progress, None
+            if progress_data is None:
+                return
+            self._last_progress_emit = time.monotonic()
+        self._send_scan_progress(progress_data)
+    
+    def _send_scan_progress(self, progress_data: dict):
+        # Only the newest progress update is kept for replay
+        self._emit('scan-progress', {
+            'agent_id': self.agent_id,
+            'progress': progress_data,
+            'timestamp': time.time()
+        }, 'scan progress', latest_only=True)
     
     def emit_scan_completed(self, results: dict):
         """Emit scan completion notification"""
-        try:
-            if self.connected:
-                self.sio.emit('scan-completed', {
-                    'agent_id': self.agent_id,
-                    'results': results,
-                    'timestamp': time.time()
-                })
-        except Exception as e:
-            logger.error(f"Failed to emit scan completion: {e}")
+        self.flush_scan_progress()
+        self._emit('scan-completed', {
+            'agent_id': self.agent_id,
+            'results': results,
+            'timestamp': time.time()
+        }, 'scan completion')
     
     def emit_scan_error(self, error_message: str):
         """Emit scan error notification"""
-        try:
-            if self.connected:
-                self.sio.emit('scan-error', {
-                    'agent_id': self.agent_id,
-                    'error': error_message,
-                    'timestamp': time.time()
-                })
-        except Exception as e:
-            logger.error(f"Failed to emit scan error: {e}")
+        self.flush_scan_progress()
+        self._emit('scan-error', {
+            'agent_id': self.agent_id,
+            'error': error_message,
+            'timestamp': time.time()
+        }, 'scan error')
     
     def emit_scan_status(self, status: dict):
         """Emit current scan status"""
-        try:
+        self._emit('scan-status-response', {
+            'agent_id': self.agent_id,
+            'status': status,
+            'timestamp': time.time()
+        }, 'scan status', replay=False)
+    
+    def _emit(self, event: str, payload: dict, description: str,
+              replay: bool = True, latest_only: bool = False):
+        """
+        Emit an event. If replay is set it goes through the replay queue, so
+        it is sent behind any messages still waiting from a disconnect and
+        stays queued for _replay_queued when disconnected (or the emit fails).
+        With latest_only, an earlier queued message for the same event is
+        dropped.
+        """
+        if not replay:
             if self.connected:
-                self.sio.emit('scan-status-response', {
-                    'agent_id': self.agent_id,
-                    'status': status,
-                    'timestamp': time.time()
-                })
-        except Exception as e:
-            logger.error(f"Failed to emit scan status: {e}")
+                try:
+                    self.sio.emit(event, payload)
+                except Exception as e:
+                    logger.error(f"Failed to emit {description}: {e}")
+            return
+        with self._replay_lock:
+            if latest_only:
+                stale = [item for item in self._replay_queue if item[0] == event]
+                for item in stale:
+                    self._replay_queue.remove(item)
+            self._replay_queue.append((event, payload))
+            if self.connected:
+                self._send_queued()
+    
+    def _replay_queued(self):
+        """Send messages queued while disconnected, oldest first"""
+        with self._replay_lock:
+            if self._replay_queue:
+                logger.info(f"Replaying {len(self._replay_queue)} queued messages")
+            self._send_queued()
+    
+    def _send_queued(self):
+        """Send queued messages in order until one fails; call with _replay_lock held"""
+        while self._replay_queue:
+            event, payload = self._replay_queue[0]
+            try:
+                self.sio.emit(event, payload)
+            except Exception as e:
+                logger.error(f"Failed to emit {event}: {e}")
+                break
+            self._replay_queue.popleft()
     
     def start_background_connection(self):
         """Start WebSocket client in background thread"""